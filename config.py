@@ -12,8 +12,32 @@ URLS_TO_SCRAPE = [
     "https://www.joelonsoftware.com/2000/08/09/the-joel-test-12-steps-to-better-code/"
 ]
 
+# Scraping Configuration
+# Upper bound on pooled browser contexts; the pool shrinks when free memory is short
+MAX_CONCURRENT_PAGES = 5
+# Approximate footprint of one context (renderer + page) inside the shared browser
+CONTEXT_MEMORY_MB = 100
+# ETag/Last-Modified validators and extracted content per URL, for conditional re-fetches
+PAGE_CACHE_PATH = "data/page_cache.db"
+
 # RAG Configuration
 EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
 VECTOR_STORE_PATH = "data/vector_store"
 CHUNK_SIZE = 1000
 CHUNK_OVERLAP = 200
+EMBEDDING_BATCH_SIZE = 64
+EMBEDDING_CACHE_PATH = "data/emb_cache.db"
+# int8 ONNX export of EMBEDDING_MODEL (create with `python -m src.embeddings`); used when present
+ONNX_MODEL_PATH = "models/all-MiniLM-L6-v2-onnx/model_int8.onnx"
+
+# FAISS HNSW index parameters
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64
+
+# Below this many documents a brute-force SIMD scan beats the HNSW graph walk
+SIMD_SEARCH_MAX_DOCS = 50_000
+
+# Semantic query cache: reuse results for queries whose embeddings are this similar
+QUERY_CACHE_SIZE = 256
+QUERY_CACHE_THRESHOLD = 0.92
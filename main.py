@@ -1,24 +1,43 @@
 
 import os
+import asyncio
 import logging
-import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from config import URLS_TO_SCRAPE
-from src.scraper import scrape_and_process_url
-from src.utils import save_docs_to_json, sanitize_filename, create_rag_summary
-from src.rag import RAGProcessor
+from src.corpus import Corpus
+from src.scraper import playwright_context_pool, scrape_and_process_url
+from src.utils import save_docs_to_json, sanitize_filename, create_rag_summary, write_json
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 OUTPUT_DIR = "data/processed"
 
+async def scrape_all_urls(urls):
+    """Scrape all URLs concurrently over a pool of isolated browser contexts"""
+    # Spawn (not fork) workers so they don't inherit the Playwright driver's state.
+    # Each worker re-imports this module, so keep the pool no larger than the URL list.
+    with ProcessPoolExecutor(
+        max_workers=max(1, min(os.cpu_count() or 1, len(urls))),
+        mp_context=multiprocessing.get_context('spawn')
+    ) as executor:
+        async with playwright_context_pool() as pool:
+            return await asyncio.gather(
+                *(scrape_and_process_url(url, pool, executor) for url in urls),
+                return_exceptions=True
+            )
+
 def run_enhanced_scraper():
     """Main function to run scraping with RAG integration"""
+    # Imported here so spawned chunking workers don't load faiss and the embedding stack
+    from src.rag import RAGProcessor
+
     logging.info("="*60)
     logging.info("STARTING ENHANCED WEB SCRAPER WITH RAG INTEGRATION")
     logging.info("="*60)
     
     os.makedirs(OUTPUT_DIR, exist_ok=True)
     
-    all_chunks = []
+    corpora = []
     successful_scrapes = 0
     failed_scrapes = 0
     total_chunks = 0
@@ -26,11 +45,14 @@ def run_enhanced_scraper():
     # Phase 1: Scrape and process all URLs
     logging.info(f"Phase 1: Scraping {len(URLS_TO_SCRAPE)} URLs with robots.txt compliance")
     
-    for i, url in enumerate(URLS_TO_SCRAPE, 1):
+    scrape_results = asyncio.run(scrape_all_urls(URLS_TO_SCRAPE))
+    
+    for i, (url, processed_chunks) in enumerate(zip(URLS_TO_SCRAPE, scrape_results), 1):
         logging.info(f"\n[{i}/{len(URLS_TO_SCRAPE)}] Processing: {url}")
         
         try:
-            processed_chunks = scrape_and_process_url(url)
+            if isinstance(processed_chunks, Exception):
+                raise processed_chunks
 
             if processed_chunks and len(processed_chunks) > 0:
                 # Save individual URL chunks
@@ -39,7 +61,7 @@ def run_enhanced_scraper():
                 chunks_saved = save_docs_to_json(processed_chunks, output_path)
                 
                 if chunks_saved > 0:
-                    all_chunks.extend(processed_chunks)
+                    corpora.append(processed_chunks)
                     total_chunks += len(processed_chunks)
                     successful_scrapes += 1
                     logging.info(f"✓ Success: {len(processed_chunks)} chunks created")
@@ -54,6 +76,8 @@ def run_enhanced_scraper():
             failed_scrapes += 1
             logging.error(f"✗ Error processing {url}: {e}")
 
+    all_chunks = Corpus.concat(corpora)
+
     # Phase 1 Summary
     logging.info("\n" + "="*50)
     logging.info("PHASE 1 COMPLETE: SCRAPING SUMMARY")
@@ -87,8 +111,7 @@ def run_enhanced_scraper():
             rag_summary = create_rag_summary(all_chunks)
             summary_path = os.path.join(OUTPUT_DIR, "rag_summary.json")
             
-            with open(summary_path, 'w', encoding='utf-8') as f:
-                json.dump(rag_summary, f, indent=2, ensure_ascii=False)
+            write_json(rag_summary, summary_path)
             
             logging.info(f"✓ RAG summary saved to {summary_path}")
             
@@ -146,6 +169,8 @@ def run_enhanced_scraper():
 
 def demo_rag_search():
     """Demonstrate RAG search capabilities"""
+    from src.rag import RAGProcessor
+
     logging.info("DEMO: RAG Search Functionality")
     
     try:
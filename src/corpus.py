@@ -0,0 +1,94 @@
+
+from dataclasses import dataclass
+from typing import List
+import numpy as np
+from langchain.schema import Document
+
+def _column(values):
+    """Build a 1-D object array (np.array would split sequences into extra dimensions)"""
+    column = np.empty(len(values), dtype=object)
+    column[:] = values
+    return column
+
+@dataclass
+class Corpus:
+    """Column-oriented chunk collection: one array per metadata field instead of a dict per chunk"""
+    contents: List[str]
+    sources: np.ndarray
+    titles: np.ndarray
+    descriptions: np.ndarray
+    selectors: np.ndarray
+    sections: np.ndarray
+    headers: np.ndarray  # markdown header values per chunk, e.g. {"H1": "Intro"}
+
+    def __len__(self):
+        return len(self.contents)
+
+    @classmethod
+    def from_documents(cls, docs):
+        """Split LangChain Documents into columns"""
+        base_keys = {"source", "title", "description", "selector_used", "section", "content_type"}
+        return cls(
+            contents=[doc.page_content for doc in docs],
+            sources=_column([doc.metadata.get("source", "Unknown") for doc in docs]),
+            titles=_column([doc.metadata.get("title", "") for doc in docs]),
+            descriptions=_column([doc.metadata.get("description", "") for doc in docs]),
+            selectors=_column([doc.metadata.get("selector_used") for doc in docs]),
+            sections=_column([doc.metadata.get("section", "") for doc in docs]),
+            headers=_column([
+                {key: value for key, value in doc.metadata.items() if key not in base_keys}
+                for doc in docs
+            ])
+        )
+
+    @classmethod
+    def concat(cls, corpora):
+        """Join several corpora into one"""
+        corpora = list(corpora)
+        return cls(
+            contents=[text for c in corpora for text in c.contents],
+            sources=_column([v for c in corpora for v in c.sources]),
+            titles=_column([v for c in corpora for v in c.titles]),
+            descriptions=_column([v for c in corpora for v in c.descriptions]),
+            selectors=_column([v for c in corpora for v in c.selectors]),
+            sections=_column([v for c in corpora for v in c.sections]),
+            headers=_column([v for c in corpora for v in c.headers])
+        )
+
+    def take(self, indices):
+        """Return a new corpus holding only the given rows"""
+        indices = np.asarray(indices, dtype=np.int64)
+        return Corpus(
+            contents=[self.contents[i] for i in indices],
+            sources=self.sources[indices],
+            titles=self.titles[indices],
+            descriptions=self.descriptions[indices],
+            selectors=self.selectors[indices],
+            sections=self.sections[indices],
+            headers=self.headers[indices]
+        )
+
+    def content_lengths(self):
+        """Character length of every chunk as an int64 array"""
+        return np.fromiter((len(text) for text in self.contents), dtype=np.int64, count=len(self))
+
+    def metadata(self, i):
+        """Materialize the metadata dict for a single chunk"""
+        metadata = dict(self.headers[i])
+        metadata.update({
+            "source": self.sources[i],
+            "title": self.titles[i],
+            "description": self.descriptions[i],
+            "selector_used": self.selectors[i],
+            "content_type": "markdown"
+        })
+        if self.sections[i]:
+            metadata["section"] = self.sections[i]
+        return metadata
+
+    def to_documents(self):
+        """Materialize LangChain Documents (only needed where LangChain requires them)"""
+        return [
+            Document(page_content=self.contents[i], metadata=self.metadata(i))
+            for i in range(len(self))
+        ]
@@ -0,0 +1,76 @@
+
+import logging
+import os
+from typing import List
+import numpy as np
+import onnxruntime as ort
+from transformers import AutoTokenizer
+from langchain_core.embeddings import Embeddings
+from config import EMBEDDING_MODEL, EMBEDDING_BATCH_SIZE, ONNX_MODEL_PATH
+
+class OnnxEmbeddings(Embeddings):
+    """Sentence embeddings from an int8-quantized ONNX export, run with onnxruntime"""
+
+    def __init__(self, model_path=ONNX_MODEL_PATH, tokenizer_name=EMBEDDING_MODEL,
+                 batch_size=EMBEDDING_BATCH_SIZE, max_length=256):
+        sess_options = ort.SessionOptions()
+        sess_options.intra_op_num_threads = os.cpu_count()
+        sess_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            model_path, sess_options, providers=['CPUExecutionProvider']
+        )
+        self.input_names = [node.name for node in self.session.get_inputs()]
+        self.tokenizer = AutoTokenizer.from_pretrained(tokenizer_name)
+        self.batch_size = batch_size
+        self.max_length = max_length
+
+    def encode(self, texts):
+        """Encode texts into L2-normalized float32 vectors using mean pooling"""
+        batches = []
+        for start in range(0, len(texts), self.batch_size):
+            tokens = self.tokenizer(
+                texts[start:start + self.batch_size],
+                padding=True,
+                truncation=True,
+                max_length=self.max_length,
+                return_tensors='np'
+            )
+            inputs = {name: tokens[name].astype(np.int64) for name in self.input_names if name in tokens}
+            hidden = self.session.run(None, inputs)[0]
+
+            # Mean-pool token embeddings over the attention mask, as sentence-transformers does
+            mask = tokens['attention_mask'][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+            pooled /= np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+            batches.append(pooled.astype(np.float32))
+
+        if not batches:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.vstack(batches)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.encode(list(texts)).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.encode([text])[0].tolist()
+
+def export_quantized_model(model_name=EMBEDDING_MODEL, output_path=ONNX_MODEL_PATH):
+    """Export the embedding model to ONNX and dynamically quantize its weights to int8"""
+    from optimum.onnxruntime import ORTModelForFeatureExtraction
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    export_dir = os.path.join(os.path.dirname(output_path), "fp32")
+    logging.info(f"Exporting {model_name} to ONNX in {export_dir}")
+    ORTModelForFeatureExtraction.from_pretrained(model_name, export=True).save_pretrained(export_dir)
+
+    logging.info(f"Quantizing weights to int8: {output_path}")
+    quantize_dynamic(
+        os.path.join(export_dir, "model.onnx"),
+        output_path,
+        weight_type=QuantType.QInt8
+    )
+    return output_path
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    export_quantized_model()
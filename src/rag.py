@@ -1,52 +1,181 @@
 
+import hashlib
 import logging
 import os
+import sqlite3
 from typing import List, Optional
+import faiss
+import numpy as np
+try:
+    import simsimd
+except ImportError:
+    simsimd = None
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_community.vectorstores import FAISS
 from langchain.schema import Document
-from config import EMBEDDING_MODEL, VECTOR_STORE_PATH
+from src.utils import read_jsonl, write_jsonl
+from config import (
+    EMBEDDING_MODEL, EMBEDDING_BATCH_SIZE, EMBEDDING_CACHE_PATH, ONNX_MODEL_PATH, VECTOR_STORE_PATH,
+    HNSW_M, HNSW_EF_CONSTRUCTION, HNSW_EF_SEARCH, SIMD_SEARCH_MAX_DOCS,
+    QUERY_CACHE_SIZE, QUERY_CACHE_THRESHOLD
+)
+
+INDEX_FILE = "index.faiss"
+DOCSTORE_FILE = "corpus.jsonl"
+QUANTIZED_MATRIX_FILE = "embeddings_int8.npy"
+QUANTIZED_SCALES_FILE = "embeddings_scales.npy"
+
+def quantize_int8(embeddings):
+    """Quantize float embeddings to int8 with a per-vector scale"""
+    embeddings = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+    max_abs = np.max(np.abs(embeddings), axis=1, keepdims=True)
+    scales = 127.0 / np.maximum(max_abs, np.finfo(np.float32).tiny)
+    quantized = np.clip(np.rint(embeddings * scales), -127, 127).astype(np.int8)
+    return quantized, scales.astype(np.float32)
+
+def top_k_indices(scores, k):
+    """Indices of the k smallest scores in ascending order, in O(N + k log k)"""
+    n = len(scores)
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.int64)
+    if k >= n:
+        return np.argsort(scores)
+    idx = np.argpartition(scores, k - 1)[:k]
+    return idx[np.argsort(scores[idx])]
 
 class RAGProcessor:
     def __init__(self):
         self.embeddings = None
+        self.embedding_id = EMBEDDING_MODEL
         self.vector_store = None
+        self.matrix = None
+        self.scales = None
+        self.docs = []
+        self.cache = None
+        self._q_cache_embs = None
+        self._q_cache_results = []
         self.setup_embeddings()
+        self.setup_embedding_cache()
     
     def setup_embeddings(self):
         """Initialize embedding model"""
         try:
+            if os.path.exists(ONNX_MODEL_PATH):
+                logging.info(f"Loading int8 ONNX embedding model: {ONNX_MODEL_PATH}")
+                # Imported lazily so onnxruntime/transformers only load when the export exists
+                from src.embeddings import OnnxEmbeddings
+                self.embeddings = OnnxEmbeddings(ONNX_MODEL_PATH, EMBEDDING_MODEL)
+                self.embedding_id = f"{EMBEDDING_MODEL}:onnx-int8"
+                logging.info("Embedding model loaded successfully")
+                return
+            
             logging.info(f"Loading embedding model: {EMBEDDING_MODEL}")
             self.embeddings = HuggingFaceEmbeddings(
                 model_name=EMBEDDING_MODEL,
                 model_kwargs={'device': 'cpu'},
-                encode_kwargs={'normalize_embeddings': True}
+                encode_kwargs={'normalize_embeddings': True, 'batch_size': EMBEDDING_BATCH_SIZE}
             )
             logging.info("Embedding model loaded successfully")
         except Exception as e:
             logging.error(f"Failed to load embedding model: {e}")
             raise
     
-    def create_vector_store(self, documents):
-        """Create vector store from documents"""
+    def setup_embedding_cache(self):
+        """Open the on-disk embedding cache keyed by content hash"""
         try:
-            logging.info(f"Creating vector store from {len(documents)} documents...")
+            os.makedirs(os.path.dirname(EMBEDDING_CACHE_PATH), exist_ok=True)
+            self.cache = sqlite3.connect(EMBEDDING_CACHE_PATH)
+            self.cache.execute('CREATE TABLE IF NOT EXISTS emb(h BLOB PRIMARY KEY, v BLOB)')
+            self.cache.commit()
+        except sqlite3.Error as e:
+            logging.warning(f"Embedding cache unavailable, embedding without cache: {e}")
+            self.cache = None
+    
+    def _encode_batch(self, texts):
+        """Encode texts in batches with the loaded embedding model"""
+        # OnnxEmbeddings exposes encode() directly; HuggingFaceEmbeddings wraps a SentenceTransformer client
+        if hasattr(self.embeddings, 'encode'):
+            return self.embeddings.encode(texts)
+        return self.embeddings.client.encode(
+            texts,
+            batch_size=EMBEDDING_BATCH_SIZE,
+            normalize_embeddings=True,
+            show_progress_bar=False,
+            convert_to_numpy=True
+        ).astype(np.float32)
+    
+    def _encode_texts(self, texts):
+        """Encode texts, reusing cached vectors for content embedded on earlier runs"""
+        if self.cache is None:
+            return self._encode_batch(texts)
+        
+        # Key on model + content so switching models or backends never returns stale vectors
+        hashes = [hashlib.sha256(f"{self.embedding_id}\0{text}".encode('utf-8')).digest() for text in texts]
+        
+        cached = {}
+        unique_hashes = list(dict.fromkeys(hashes))
+        for start in range(0, len(unique_hashes), 500):  # stay under SQLite's bound-parameter limit
+            batch = unique_hashes[start:start + 500]
+            placeholders = ','.join('?' * len(batch))
+            cached.update(self.cache.execute(f'SELECT h, v FROM emb WHERE h IN ({placeholders})', batch))
+        
+        misses = {h: text for h, text in zip(hashes, texts) if h not in cached}
+        if misses:
+            miss_vectors = self._encode_batch(list(misses.values()))
+            new_rows = [(h, vec.tobytes()) for h, vec in zip(misses, miss_vectors)]
+            self.cache.executemany('INSERT OR REPLACE INTO emb(h, v) VALUES (?, ?)', new_rows)
+            self.cache.commit()
+            cached.update(new_rows)
+        
+        logging.info(f"Embedding cache: {len(unique_hashes) - len(misses)} hits, {len(misses)} misses")
+        return np.stack([np.frombuffer(cached[h], dtype=np.float32) for h in hashes])
+    
+    def create_vector_store(self, corpus):
+        """Create vector store from a Corpus of chunks"""
+        try:
+            logging.info(f"Creating vector store from {len(corpus)} documents...")
             
             # Filter documents with meaningful content
-            valid_docs = [doc for doc in documents if len(doc.page_content.strip()) > 30]
+            valid_idx = [i for i, text in enumerate(corpus.contents) if len(text.strip()) > 30]
             
-            if not valid_docs:
+            if not valid_idx:
                 logging.error("No valid documents for vector store creation")
                 return None
             
-            self.vector_store = FAISS.from_documents(valid_docs, self.embeddings)
-            logging.info(f"Vector store created with {len(valid_docs)} documents")
+            valid = corpus.take(valid_idx)
+            
+            # Encode all chunks in one batched pass instead of going through from_documents
+            embeddings = self._encode_texts(valid.contents)
+            
+            # HNSW graph over 8-bit scalar-quantized vectors: 4x smaller than float32
+            index = faiss.IndexHNSWSQ(embeddings.shape[1], faiss.ScalarQuantizer.QT_8bit, HNSW_M)
+            index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+            index.train(embeddings)
+            index.add(embeddings)
+            
+            # LangChain's docstore is the one place that needs materialized Documents
+            self._wrap_index(index, valid.to_documents())
+            self.matrix, self.scales = quantize_int8(embeddings)
+            self.clear_cache()
+            logging.info(f"Vector store created with {len(valid)} documents")
             return self.vector_store
             
         except Exception as e:
             logging.error(f"Failed to create vector store: {e}")
             return None
     
+    def _wrap_index(self, index, docs):
+        """Wrap a raw FAISS index and its row-aligned documents in LangChain's FAISS store"""
+        docstore = InMemoryDocstore({str(i): doc for i, doc in enumerate(docs)})
+        self.vector_store = FAISS(
+            embedding_function=self.embeddings,
+            index=index,
+            docstore=docstore,
+            index_to_docstore_id={i: str(i) for i in range(len(docs))}
+        )
+        self.docs = docs
+    
     def save_vector_store(self, path=None):
         """Save vector store to disk"""
         if not self.vector_store:
@@ -56,7 +185,15 @@ class RAGProcessor:
         save_path = path or VECTOR_STORE_PATH
         try:
             os.makedirs(save_path, exist_ok=True)
-            self.vector_store.save_local(save_path)
+            # Native FAISS binary plus a JSONL docstore sidecar instead of LangChain's pickle
+            faiss.write_index(self.vector_store.index, os.path.join(save_path, INDEX_FILE))
+            write_jsonl(
+                ({"page_content": doc.page_content, "metadata": doc.metadata} for doc in self.docs),
+                os.path.join(save_path, DOCSTORE_FILE)
+            )
+            if self.matrix is not None:
+                np.save(os.path.join(save_path, QUANTIZED_MATRIX_FILE), self.matrix)
+                np.save(os.path.join(save_path, QUANTIZED_SCALES_FILE), self.scales)
             logging.info(f"Vector store saved to {save_path}")
             return True
         except Exception as e:
@@ -67,25 +204,104 @@ class RAGProcessor:
         """Load vector store from disk"""
         load_path = path or VECTOR_STORE_PATH
         try:
-            self.vector_store = FAISS.load_local(
-                load_path, 
-                self.embeddings, 
-                allow_dangerous_deserialization=True
-            )
+            index = faiss.read_index(os.path.join(load_path, INDEX_FILE))
+            docs = [Document(**record) for record in read_jsonl(os.path.join(load_path, DOCSTORE_FILE))]
+            if len(docs) != index.ntotal:
+                raise ValueError(f"Docstore has {len(docs)} documents but index has {index.ntotal} vectors")
+            
+            self._wrap_index(index, docs)
+            self._build_search_matrix(load_path)
+            self.clear_cache()
             logging.info(f"Vector store loaded from {load_path}")
             return self.vector_store
         except Exception as e:
             logging.error(f"Failed to load vector store from {load_path}: {e}")
             return None
     
-    def similarity_search(self, query, k=5):
+    def _build_search_matrix(self, load_path):
+        """Memory-map the int8 embedding matrix, or rebuild it from the index"""
+        index = self.vector_store.index
+        matrix_path = os.path.join(load_path, QUANTIZED_MATRIX_FILE)
+        scales_path = os.path.join(load_path, QUANTIZED_SCALES_FILE)
+        if os.path.exists(matrix_path) and os.path.exists(scales_path):
+            self.matrix = np.load(matrix_path, mmap_mode='r')
+            self.scales = np.load(scales_path, mmap_mode='r')
+        else:
+            self.matrix, self.scales = quantize_int8(index.reconstruct_n(0, index.ntotal))
+    
+    def _simd_search(self, query_vec, k):
+        """Brute-force int8 cosine search over the quantized embedding matrix"""
+        query_q, _ = quantize_int8(query_vec)
+        if simsimd is not None:
+            scores = np.asarray(simsimd.cdist(query_q, self.matrix, metric='cosine'))[0]
+        else:
+            # Cosine is scale-invariant, so the int8 codes can be compared directly
+            matrix = np.asarray(self.matrix, dtype=np.float32)
+            query = query_q[0].astype(np.float32)
+            norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+            scores = 1.0 - (matrix @ query) / np.maximum(norms, np.finfo(np.float32).tiny)
+        
+        # Cosine distances: smaller is closer
+        return [(self.docs[i], float(scores[i])) for i in top_k_indices(scores, k)]
+    
+    def _lookup_query_cache(self, query_vec, k):
+        """Return cached results for a semantically equivalent earlier query, if any"""
+        if not self._q_cache_results:
+            return None
+        
+        # Query embeddings are normalized, so the dot product is the cosine similarity
+        sims = self._q_cache_embs @ query_vec
+        best = int(np.argmax(sims))
+        cached_k, results = self._q_cache_results[best]
+        if sims[best] < QUERY_CACHE_THRESHOLD or cached_k < k:
+            return None
+        
+        # Move the hit to the most-recently-used end
+        self._q_cache_embs = np.vstack([np.delete(self._q_cache_embs, best, axis=0), self._q_cache_embs[best]])
+        self._q_cache_results.append(self._q_cache_results.pop(best))
+        return results[:k]
+    
+    def _store_query_cache(self, query_vec, k, results):
+        """Remember query results, evicting the least recently used entry when full"""
+        row = query_vec.reshape(1, -1)
+        self._q_cache_embs = row if self._q_cache_embs is None else np.vstack([self._q_cache_embs, row])
+        self._q_cache_results.append((k, results))
+        if len(self._q_cache_results) > QUERY_CACHE_SIZE:
+            self._q_cache_embs = self._q_cache_embs[1:]
+            self._q_cache_results.pop(0)
+    
+    def clear_cache(self):
+        """Drop all cached query results (e.g. after sensitive prompts or a store rebuild)"""
+        self._q_cache_embs = None
+        self._q_cache_results = []
+    
+    def similarity_search(self, query, k=5, use_cache=True):
         """Perform similarity search"""
         if not self.vector_store:
             logging.error("Vector store not initialized")
             return []
         
         try:
-            results = self.vector_store.similarity_search(query, k=k)
+            query_vec = np.asarray(self.embeddings.embed_query(query), dtype=np.float32)
+            
+            if use_cache:
+                cached = self._lookup_query_cache(query_vec, k)
+                if cached is not None:
+                    logging.info(f"Semantic cache hit for query: '{query[:50]}...'")
+                    return cached
+            
+            if self.matrix is not None and 0 < len(self.matrix) < SIMD_SEARCH_MAX_DOCS:
+                results = [doc for doc, _ in self._simd_search(query_vec, k)]
+            else:
+                # Widen the HNSW beam for larger k to keep recall up
+                if isinstance(self.vector_store.index, faiss.IndexHNSW):
+                    self.vector_store.index.hnsw.efSearch = max(k * 8, HNSW_EF_SEARCH)
+                
+                results = self.vector_store.similarity_search_by_vector(query_vec.tolist(), k=k)
+            
+            if use_cache:
+                self._store_query_cache(query_vec, k, results)
+            
             logging.info(f"Found {len(results)} results for query: '{query[:50]}...'")
             return results
         except Exception as e:
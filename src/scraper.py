@@ -1,25 +1,70 @@
 
+import asyncio
+import contextlib
 import logging
-import html2text
+import os
 import re
+import sqlite3
 from urllib.robotparser import RobotFileParser
 from urllib.parse import urlparse
 
-from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
-from langchain.text_splitter import MarkdownHeaderTextSplitter, RecursiveCharacterTextSplitter
-from config import CHUNK_SIZE, CHUNK_OVERLAP
+import aiohttp
+try:
+    import psutil
+except ImportError:
+    psutil = None
+from selectolax.lexbor import LexborHTMLParser
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
+from src.corpus import Corpus
+from src.splitters import split_markdown
+from src.utils import fast_clean
+from config import PAGE_CACHE_PATH, MAX_CONCURRENT_PAGES, CONTEXT_MEMORY_MB
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def check_robots_txt(url):
-    """Check robots.txt compliance"""
+_JUNK = re.compile(r'^[\s\W]*$')
+
+# Block-level elements that become markdown paragraphs; nested blocks are emitted by their outermost ancestor
+_BLOCK_TAGS = frozenset({
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'p', 'li', 'pre', 'blockquote',
+    'dt', 'dd', 'figcaption', 'td', 'th'
+})
+# Elements whose text flows into the surrounding paragraph
+_INLINE_TAGS = frozenset({
+    'a', 'abbr', 'b', 'bdi', 'bdo', 'cite', 'code', 'data', 'dfn', 'em', 'font', 'i', 'kbd',
+    'mark', 'q', 's', 'samp', 'small', 'span', 'strong', 'sub', 'sup', 'time', 'u', 'var'
+})
+_STRIP_TAGS = ['script', 'style', 'noscript', 'svg', 'template', 'iframe']
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
+
+_PAGE_CACHE_SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS pages(url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, '
+    'html TEXT, title TEXT, description TEXT, selector TEXT)'
+)
+
+# Resources that are never needed for text extraction
+BLOCKED_RESOURCE_TYPES = frozenset({'image', 'font', 'stylesheet', 'media', 'websocket'})
+
+async def check_robots_txt(url):
+    """Check robots.txt compliance without blocking the event loop"""
     parsed_url = urlparse(url)
     robots_url = f"{parsed_url.scheme}://{parsed_url.netloc}/robots.txt"
     parser = RobotFileParser()
     parser.set_url(robots_url)
     try:
         logging.info(f"Checking robots.txt at: {robots_url}")
-        parser.read()
+        timeout = aiohttp.ClientTimeout(total=30)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            async with session.get(robots_url) as response:
+                # Mirror RobotFileParser.read(): auth and server errors disallow all, other 4xx allow all
+                if response.status in (401, 403) or response.status >= 500:
+                    parser.disallow_all = True
+                elif 400 <= response.status < 500:
+                    parser.allow_all = True
+                else:
+                    response.raise_for_status()
+                    parser.parse((await response.text()).splitlines())
         is_allowed = parser.can_fetch("*", url)
         if not is_allowed:
             logging.warning(f"Scraping DISALLOWED by robots.txt for: {url}")
@@ -28,121 +73,264 @@ def check_robots_txt(url):
         logging.warning(f"Could not fetch robots.txt from {robots_url}. Assuming allowed. Error: {e}")
         return True
 
-def clean_markdown_content(markdown_text):
-    """Clean and improve markdown content"""
-    if not markdown_text:
+def _push_children(stack, node):
+    """Push a node's children onto stack so they pop off in document order"""
+    child = node.last_child
+    while child is not None:
+        stack.append(child)
+        child = child.prev
+
+def _collect_text(node, parts):
+    """Gather a node's text, spacing only at non-inline element boundaries"""
+    # Explicit stack instead of recursion so deeply nested markup cannot hit the recursion limit
+    stack = []
+    _push_children(stack, node)
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            parts.append(item)
+            continue
+        tag = item.tag
+        if tag == '-text':
+            parts.append(item.text(deep=False))
+        elif tag in _INLINE_TAGS:
+            _push_children(stack, item)
+        elif tag != '-comment':
+            stack.append(' ')
+            _push_children(stack, item)
+            parts.append(' ')
+    return parts
+
+def _block_to_markdown(node):
+    """Render one block element as a markdown paragraph, or None if it has no text"""
+    tag = node.tag
+    if tag == 'pre':
+        text = node.text(deep=True).strip()
+        return f"```\n{text}\n```" if text else None
+
+    text = ' '.join(''.join(_collect_text(node, [])).split())
+    if not text:
+        return None
+    if tag[0] == 'h' and tag[1].isdigit():
+        return f"{'#' * int(tag[1])} {text}"
+    if tag == 'li':
+        return f"- {text}"
+    if tag == 'blockquote':
+        return f"> {text}"
+    return text
+
+def html_to_markdown(html_content):
+    """Convert HTML to lightweight markdown using the lexbor C parser"""
+    tree = LexborHTMLParser(html_content)
+    tree.strip_tags(_STRIP_TAGS)
+    if tree.body is None:
         return ""
-    
-    # Remove excessive blank lines
-    markdown_text = re.sub(r'\n{3,}', '\n\n', markdown_text)
-    
-    # Clean up malformed markdown
-    markdown_text = re.sub(r'\*{3,}', '**', markdown_text)
-    markdown_text = re.sub(r'_{3,}', '__', markdown_text)
-    
-    # Remove navigation and menu items
-    lines = markdown_text.split('\n')
-    cleaned_lines = []
-    
-    for line in lines:
-        line = line.strip()
-        # Skip common navigation patterns
-        if (len(line) < 3 or 
-            line.lower().startswith(('menu', 'nav', 'skip to', 'home |', '| home')) or
-            re.match(r'^[\s\|\-]+$', line) or
-            line.count('|') > 5):  # Likely navigation menu
+
+    blocks = []
+    loose_text = []  # text outside any block element, e.g. directly inside a <div>
+
+    def flush_loose_text():
+        text = ' '.join(''.join(loose_text).split())
+        loose_text.clear()
+        if text:
+            blocks.append(text)
+
+    # Explicit stack instead of recursion; None marks the end of a container's children
+    stack = []
+    _push_children(stack, tree.body)
+    while stack:
+        node = stack.pop()
+        if node is None:
+            flush_loose_text()
             continue
-        cleaned_lines.append(line)
-    
-    return '\n'.join(cleaned_lines)
+        tag = node.tag
+        if tag == '-text':
+            loose_text.append(node.text(deep=False))
+        elif tag == 'br':
+            loose_text.append(' ')
+        elif tag in _BLOCK_TAGS:
+            flush_loose_text()
+            block = _block_to_markdown(node)
+            if block:
+                blocks.append(block)
+        elif tag in _INLINE_TAGS:
+            _push_children(stack, node)
+        elif tag != '-comment':
+            # Other containers (div, section, table, ...) break the surrounding text run
+            flush_loose_text()
+            stack.append(None)
+            _push_children(stack, node)
+    flush_loose_text()
+    return '\n\n'.join(blocks)
+
+async def block_heavy_resources(route):
+    """Abort requests for assets that don't contribute to page text"""
+    if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+        await route.abort()
+    else:
+        await route.continue_()
 
-def scrape_and_process_url(url):
-    """Scrape URL and return cleaned, processed chunks"""
-    if not check_robots_txt(url):
+def _connect_page_cache():
+    """Open the page cache database, creating it on first use"""
+    os.makedirs(os.path.dirname(PAGE_CACHE_PATH), exist_ok=True)
+    conn = sqlite3.connect(PAGE_CACHE_PATH)
+    conn.execute(_PAGE_CACHE_SCHEMA)
+    return conn
+
+def get_cached_page(url):
+    """Return the cached validators and page data for URL, or None"""
+    with contextlib.closing(_connect_page_cache()) as conn:
+        row = conn.execute(
+            'SELECT etag, last_modified, html, title, description, selector FROM pages WHERE url = ?',
+            (url,)
+        ).fetchone()
+    if row is None:
         return None
+    return {"etag": row[0], "last_modified": row[1], "page_data": tuple(row[2:])}
+
+def store_cached_page(url, etag, last_modified, page_data):
+    """Remember page data together with its HTTP validators for conditional refetches"""
+    with contextlib.closing(_connect_page_cache()) as conn:
+        conn.execute(
+            'INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (url, etag, last_modified, *page_data)
+        )
+        conn.commit()
 
-    logging.info(f"Scraping allowed. Loading content from: {url}")
+def context_pool_size():
+    """Number of browser contexts to run, bounded by available memory"""
+    if psutil is None:
+        return MAX_CONCURRENT_PAGES
+    available_mb = psutil.virtual_memory().available // (1024 * 1024)
+    return max(1, min(MAX_CONCURRENT_PAGES, available_mb // CONTEXT_MEMORY_MB))
 
-    try:
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=True)
-            page = browser.new_page()
-            
-            # Set user agent to avoid blocking
-            page.set_extra_http_headers({
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-            })
-            
-            page.goto(url, timeout=60000, wait_until='domcontentloaded')
-
-            # Enhanced content extraction with better selectors
-            content_selectors = [
-                'article', 'main', '[role="main"]', '#main', '#content', 
-                '.main', '.content', '.post', '.entry', '.article-content',
-                '.post-content', '.entry-content', '.page-content'
+@contextlib.asynccontextmanager
+async def playwright_context_pool(size=None):
+    """Launch one Chromium and hand out isolated contexts through an asyncio.Queue"""
+    size = size or context_pool_size()
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        try:
+            # Contexts share the browser process but never share cookies or storage between sites
+            contexts = [
+                await browser.new_context(user_agent=USER_AGENT)  # Set user agent to avoid blocking
+                for _ in range(size)
             ]
-            
-            html_content = ""
-            selector_used = None
-            
-            for selector in content_selectors:
-                elements = page.locator(selector)
-                if elements.count() > 0:
-                    html_content = elements.first.inner_html()
-                    selector_used = selector
-                    logging.info(f"Extracted content using selector: '{selector}'")
-                    break
-
-            if not html_content:
-                logging.warning(f"No main content found. Using body content for {url}")
-                html_content = page.locator('body').inner_html()
-                selector_used = 'body'
-
-            # Get additional metadata
-            page_title = page.title() or "No Title"
-            page_description = ""
+            logging.info(f"Opened {size} browser contexts")
+            pool = asyncio.Queue()
+            for context in contexts:
+                pool.put_nowait(context)
+            yield pool
+        finally:
+            # Closing the browser also closes any contexts it still owns
+            await browser.close()
+
+async def fetch_page_content(url, pool):
+    """Load URL in a tab of a pooled browser context and return (html, title, description, selector)"""
+    if not await check_robots_txt(url):
+        return None
+
+    try:
+        # Revalidate against the last run; a 304 lets us reuse the stored extraction
+        cached = get_cached_page(url)
+        validators = {}
+        if cached:
+            if cached["etag"]:
+                validators["If-None-Match"] = cached["etag"]
+            if cached["last_modified"]:
+                validators["If-Modified-Since"] = cached["last_modified"]
+
+        async def route_request(route):
+            request = route.request
+            if validators and request.is_navigation_request() and request.frame.parent_frame is None:
+                await route.continue_(headers={**request.headers, **validators})
+            else:
+                await block_heavy_resources(route)
+
+        # Waiting for a free context bounds how many pages load at once
+        context = await pool.get()
+        try:
+            logging.info(f"Scraping allowed. Loading content from: {url}")
+
+            page = await context.new_page()
             try:
-                desc_element = page.locator('meta[name="description"]')
-                if desc_element.count() > 0:
-                    page_description = desc_element.get_attribute('content') or ""
-            except:
-                pass
+                page.set_default_timeout(30000)
+                await page.route('**/*', route_request)
+                response = await page.goto(url, timeout=60000, wait_until='domcontentloaded')
+
+                if response is not None and response.status == 304 and cached:
+                    logging.info(f"Not modified since last run, reusing cached content for {url}")
+                    return cached["page_data"]
 
-            browser.close()
+                # Enhanced content extraction with better selectors
+                content_selectors = [
+                    'article', 'main', '[role="main"]', '#main', '#content', 
+                    '.main', '.content', '.post', '.entry', '.article-content',
+                    '.post-content', '.entry-content', '.page-content'
+                ]
+                
+                html_content = ""
+                selector_used = None
+                
+                for selector in content_selectors:
+                    elements = page.locator(selector)
+                    if await elements.count() > 0:
+                        html_content = await elements.first.inner_html()
+                        selector_used = selector
+                        logging.info(f"Extracted content using selector: '{selector}'")
+                        break
+
+                if not html_content:
+                    logging.warning(f"No main content found. Using body content for {url}")
+                    html_content = await page.locator('body').inner_html()
+                    selector_used = 'body'
+
+                # Get additional metadata
+                page_title = await page.title() or "No Title"
+                page_description = ""
+                try:
+                    desc_element = page.locator('meta[name="description"]')
+                    if await desc_element.count() > 0:
+                        page_description = await desc_element.first.get_attribute('content') or ""
+                except:
+                    pass
+
+                etag = await response.header_value('etag') if response is not None else None
+                last_modified = await response.header_value('last-modified') if response is not None else None
+            finally:
+                await page.close()
+        finally:
+            pool.put_nowait(context)
 
         if not html_content:
             logging.warning(f"Could not extract HTML content from {url}")
             return None
 
+        page_data = (html_content, page_title, page_description, selector_used)
+        if etag or last_modified:
+            store_cached_page(url, etag, last_modified, page_data)
+        return page_data
+
+    except PlaywrightTimeoutError:
+        logging.error(f"Timeout error for {url}")
+        return None
+    except Exception as e:
+        logging.error(f"Unexpected error scraping {url}: {e}")
+        return None
+
+def process_page_content(url, html_content, page_title, page_description, selector_used):
+    """Convert fetched HTML into a Corpus of cleaned chunks (CPU-bound, safe to run in a worker process)"""
+    try:
         # Convert HTML to clean markdown
-        h = html2text.HTML2Text()
-        h.body_width = 0
-        h.ignore_links = False
-        h.ignore_images = True  # Skip images for cleaner text
-        h.ignore_emphasis = False
-        h.skip_internal_links = True
-        
-        markdown_content = h.handle(html_content)
+        markdown_content = html_to_markdown(html_content)
         
         # Clean the markdown content
-        markdown_content = clean_markdown_content(markdown_content)
+        markdown_content = fast_clean(markdown_content)
 
         if not markdown_content.strip() or len(markdown_content.strip()) < 100:
             logging.warning(f"Insufficient content after cleaning for {url}")
             return None
 
-        # Smart chunking with header awareness
-        headers_to_split_on = [("#", "H1"), ("##", "H2"), ("###", "H3")]
-        markdown_splitter = MarkdownHeaderTextSplitter(
-            headers_to_split_on=headers_to_split_on, 
-            strip_headers=False
-        )
-        
-        try:
-            md_header_splits = markdown_splitter.split_text(markdown_content)
-        except:
-            md_header_splits = []
-
         # Enhanced metadata
         base_metadata = {
             "source": url,
@@ -152,39 +340,13 @@ def scrape_and_process_url(url):
             "content_type": "markdown"
         }
 
-        if md_header_splits:
-            final_chunks = []
-            splitter = RecursiveCharacterTextSplitter(
-                chunk_size=CHUNK_SIZE,
-                chunk_overlap=CHUNK_OVERLAP,
-                separators=["\n\n", "\n", ". ", " ", ""]
-            )
-            
-            for split in md_header_splits:
-                split.metadata.update(base_metadata)
-                # Add header context if available
-                header_info = split.metadata.get('Header 1', '') or split.metadata.get('Header 2', '')
-                if header_info:
-                    split.metadata['section'] = header_info
-                
-                further_splits = splitter.split_documents([split])
-                final_chunks.extend(further_splits)
-            
-            chunks = final_chunks
-        else:
-            # Fallback chunking
-            splitter = RecursiveCharacterTextSplitter(
-                chunk_size=CHUNK_SIZE,
-                chunk_overlap=CHUNK_OVERLAP,
-                separators=["\n\n", "\n", ". ", " ", ""]
-            )
-            chunks = splitter.create_documents([markdown_content], metadatas=[base_metadata])
+        chunks = split_markdown(url, markdown_content, base_metadata)
 
         # Filter out very short or empty chunks
         valid_chunks = []
         for chunk in chunks:
             clean_content = chunk.page_content.strip()
-            if len(clean_content) > 50 and not re.match(r'^[\s\W]*$', clean_content):
+            if len(clean_content) > 50 and not _JUNK.match(clean_content):
                 chunk.page_content = clean_content
                 valid_chunks.append(chunk)
 
@@ -193,11 +355,25 @@ def scrape_and_process_url(url):
             return None
 
         logging.info(f"Successfully processed {url}: {len(valid_chunks)} clean chunks created")
-        return valid_chunks
+        return Corpus.from_documents(valid_chunks)
 
-    except PlaywrightTimeoutError:
-        logging.error(f"Timeout error for {url}")
-        return None
     except Exception as e:
-        logging.error(f"Unexpected error scraping {url}: {e}")
+        logging.error(f"Unexpected error processing {url}: {e}")
         return None
+
+async def scrape_and_process_url(url, pool=None, executor=None):
+    """Scrape URL and return a Corpus of cleaned, processed chunks"""
+    if pool is None:
+        async with playwright_context_pool(1) as pool:
+            return await scrape_and_process_url(url, pool, executor)
+
+    page_data = await fetch_page_content(url, pool)
+    if page_data is None:
+        return None
+
+    if executor is None:
+        return process_page_content(url, *page_data)
+
+    # Hand the CPU-bound conversion and chunking to the worker pool so fetching continues
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, process_page_content, url, *page_data)
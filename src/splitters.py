@@ -0,0 +1,113 @@
+
+import re
+from typing import Callable, Dict, List
+from urllib.parse import urlparse
+
+from langchain.schema import Document
+from langchain.text_splitter import MarkdownHeaderTextSplitter, RecursiveCharacterTextSplitter
+from config import CHUNK_SIZE, CHUNK_OVERLAP
+
+# Same header levels langchain_split splits on; deeper headings and '#hashtag' lines stay in their section
+_SPLIT_HEADER = re.compile(r'\n#{1,3} ')
+
+def langchain_split(markdown_content, base_metadata):
+    """Header-aware chunking with LangChain's markdown and recursive splitters"""
+    # Smart chunking with header awareness
+    headers_to_split_on = [("#", "H1"), ("##", "H2"), ("###", "H3")]
+    markdown_splitter = MarkdownHeaderTextSplitter(
+        headers_to_split_on=headers_to_split_on,
+        strip_headers=False
+    )
+
+    try:
+        md_header_splits = markdown_splitter.split_text(markdown_content)
+    except:
+        md_header_splits = []
+
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+        separators=["\n\n", "\n", ". ", " ", ""]
+    )
+
+    if not md_header_splits:
+        # Fallback chunking
+        return splitter.create_documents([markdown_content], metadatas=[base_metadata])
+
+    final_chunks = []
+    for split in md_header_splits:
+        split.metadata.update(base_metadata)
+        # Add header context if available
+        header_info = split.metadata.get('Header 1', '') or split.metadata.get('Header 2', '')
+        if header_info:
+            split.metadata['section'] = header_info
+
+        further_splits = splitter.split_documents([split])
+        final_chunks.extend(further_splits)
+
+    return final_chunks
+
+def _next_header(text, start, fence_state):
+    """Find the next H1-H3 header line at or after start that is not inside a ``` code fence"""
+    while True:
+        match = _SPLIT_HEADER.search(text, start)
+        pos = -1 if match is None else match.start()
+        end = len(text) if pos == -1 else pos
+        # Every fence marker passed since the last scan toggles the in-fence state
+        fence_state[1] ^= text.count('\n```', fence_state[0], end) & 1
+        fence_state[0] = end
+        if pos == -1 or not fence_state[1]:
+            return pos
+        start = pos + 1
+
+def window_split(markdown_content, base_metadata):
+    """Fixed-size overlapping windows with O(1) header tracking, for sites with stable header-structured markup"""
+    text = '\n' + markdown_content
+    chunks = []
+    headers = {}
+    fence_state = [0, 0]  # [scanned up to, inside a code fence]
+
+    pos = 0
+    while pos != -1:
+        nxt = _next_header(text, pos + 1, fence_state)
+        section = text[pos:len(text) if nxt == -1 else nxt].strip()
+        pos = nxt
+
+        if section.startswith('#'):
+            line_end = section.find('\n')
+            header_line = section if line_end == -1 else section[:line_end]
+            level = len(header_line) - len(header_line.lstrip('#'))
+            if level <= 3 and header_line[level:level + 1] == ' ':
+                # A new header closes every header at the same or a deeper level
+                headers = {key: value for key, value in headers.items() if int(key[1]) < level}
+                headers[f"H{level}"] = header_line[level:].strip()
+
+        metadata = {**headers, **base_metadata}
+        start = 0
+        while start < len(section):
+            end = start + CHUNK_SIZE
+            if end < len(section):
+                # Prefer to break on whitespace rather than mid-word
+                cut = section.rfind(' ', start + CHUNK_OVERLAP + 1, end)
+                if cut != -1:
+                    end = cut
+            chunks.append(Document(page_content=section[start:end], metadata=dict(metadata)))
+            if end >= len(section):
+                break
+            start = end - CHUNK_OVERLAP
+            space = section.find(' ', start, end)
+            if space != -1:
+                start = space + 1
+
+    return chunks
+
+# Domains whose pages have stable, header-structured markup and can skip the LangChain splitters
+SPLITTER_REGISTRY: Dict[str, Callable[[str, dict], List[Document]]] = {
+    "en.wikipedia.org": window_split,
+    "docs.docker.com": window_split,
+}
+
+def split_markdown(url, markdown_content, base_metadata):
+    """Chunk markdown with the splitter registered for the URL's domain, or LangChain's by default"""
+    splitter = SPLITTER_REGISTRY.get(urlparse(url).netloc, langchain_split)
+    return splitter(markdown_content, base_metadata)
@@ -1,48 +1,95 @@
 
+import io
 import json
 import os
 import re
 import logging
 from typing import List
+import numpy as np
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
-def clean_text(text):
-    """Clean and normalize text for better LLM processing"""
+# Deletion table for control characters (same set as [\x00-\x08\x0B\x0C\x0E-\x1F\x7F-\x9F])
+_CTRL_TABLE = dict.fromkeys([*range(0x00, 0x09), 0x0B, 0x0C, *range(0x0E, 0x20), *range(0x7F, 0xA0)])
+# Runs of repeated markdown/punctuation characters and what each collapses to
+_RUNS = re.compile(r'\*{3,}|_{3,}|\.{3,}|-{3,}')
+_RUN_REPLACEMENTS = {'*': '**', '_': '__', '.': '...', '-': '---'}
+_NAV = re.compile(r'^[\s\|\-]+$')
+_NAV_PREFIXES = ('menu', 'nav', 'skip to', 'home |', '| home')
+
+def fast_clean(text):
+    """Clean scraped markdown in one sweep: control chars, repeated punctuation and navigation lines"""
     if not text:
         return ""
     
-    # Remove excessive whitespace
-    text = re.sub(r'\s+', ' ', text)
-    
     # Remove special characters that might interfere
-    text = re.sub(r'[\x00-\x08\x0B\x0C\x0E-\x1F\x7F-\x9F]', '', text)
+    text = text.translate(_CTRL_TABLE)
+    
+    # Clean up malformed markdown and excessive punctuation with a single alternation
+    text = _RUNS.sub(lambda m: _RUN_REPLACEMENTS[m.group()[0]], text)
     
-    # Clean up common web artifacts
-    text = re.sub(r'\n\s*\n\s*\n+', '\n\n', text)
-    text = re.sub(r'\t+', ' ', text)
+    # Remove navigation and menu items line by line.
+    # Blank lines fall under the length check, so no separate blank-line collapse is needed.
+    cleaned_lines = []
+    append = cleaned_lines.append
     
-    # Remove excessive punctuation
-    text = re.sub(r'[.]{3,}', '...', text)
-    text = re.sub(r'[-]{3,}', '---', text)
+    for line in io.StringIO(text):
+        line = line.strip()
+        # Skip common navigation patterns
+        if (len(line) < 3 or 
+            line.lower().startswith(_NAV_PREFIXES) or
+            _NAV.match(line) or
+            line.count('|') > 5):  # Likely navigation menu
+            continue
+        append(line)
     
-    return text.strip()
+    return '\n'.join(cleaned_lines)
+
+def write_json(data, filename):
+    """Write data as indented JSON, using orjson when it is installed"""
+    if orjson is not None:
+        with open(filename, 'wb') as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
+    else:
+        with open(filename, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
 
-def save_docs_to_json(docs, filename):
-    """Save documents to JSON with cleaned content"""
+def write_jsonl(records, filename):
+    """Write records as line-delimited JSON, using orjson when it is installed"""
+    if orjson is not None:
+        with open(filename, 'wb') as f:
+            for record in records:
+                f.write(orjson.dumps(record, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_APPEND_NEWLINE))
+    else:
+        with open(filename, 'w', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+def read_jsonl(filename):
+    """Read line-delimited JSON records"""
+    loads = orjson.loads if orjson is not None else json.loads
+    with open(filename, 'rb') as f:
+        return [loads(line) for line in f if line.strip()]
+
+def save_docs_to_json(corpus, filename):
+    """Save a Corpus to JSON with cleaned content"""
     os.makedirs(os.path.dirname(filename), exist_ok=True)
     
     cleaned_docs = []
-    for doc in docs:
-        cleaned_content = clean_text(doc.page_content)
+    for i, content in enumerate(corpus.contents):
+        # Content was cleaned by fast_clean before chunking; only flatten whitespace here
+        cleaned_content = ' '.join(content.split())
         if cleaned_content and len(cleaned_content) > 50:  # Only save meaningful content
             cleaned_docs.append({
                 "page_content": cleaned_content,
-                "metadata": doc.metadata,
+                "metadata": corpus.metadata(i),
                 "content_length": len(cleaned_content)
             })
     
     try:
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(cleaned_docs, f, indent=2, ensure_ascii=False)
+        write_json(cleaned_docs, filename)
         logging.info(f"Successfully saved {len(cleaned_docs)} cleaned chunks to {filename}")
         return len(cleaned_docs)
     except Exception as e:
@@ -55,27 +102,26 @@ def sanitize_filename(url):
     sanitized = re.sub(r'[\/:*?"<>|]', '_', sanitized)
     return sanitized[:100]
 
-def create_rag_summary(all_chunks):
+def create_rag_summary(corpus):
     """Create a comprehensive summary for RAG use"""
-    if not all_chunks:
+    if not len(corpus):
         return {"error": "No chunks available"}
     
-    total_chunks = len(all_chunks)
-    sources = list(set([chunk.metadata.get('source', 'Unknown') for chunk in all_chunks]))
+    total_chunks = len(corpus)
+    sources = np.unique(corpus.sources).tolist()
     
-    # Calculate content statistics
-    content_lengths = [len(chunk.page_content) for chunk in all_chunks]
-    avg_length = sum(content_lengths) / len(content_lengths)
+    # Calculate content statistics with vectorized reductions
+    content_lengths = corpus.content_lengths()
     
     summary = {
         "total_documents": total_chunks,
         "unique_sources": len(sources),
         "sources": sources,
         "content_stats": {
-            "avg_chunk_length": round(avg_length, 2),
-            "min_chunk_length": min(content_lengths),
-            "max_chunk_length": max(content_lengths),
-            "total_characters": sum(content_lengths)
+            "avg_chunk_length": round(float(content_lengths.mean()), 2),
+            "min_chunk_length": int(content_lengths.min()),
+            "max_chunk_length": int(content_lengths.max()),
+            "total_characters": int(content_lengths.sum())
         },
         "ready_for_rag": True,
         "embedding_compatible": True
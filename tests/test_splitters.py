@@ -0,0 +1,33 @@
+from src.splitters import window_split
+
+BASE_METADATA = {"source": "https://en.wikipedia.org/wiki/Example"}
+
+DEEP_HEADINGS = (
+    "## History\nShort intro line.\n#### Early work\nFirst prototypes appeared.\n#### Later work\n"
+    + "Body text. " * 10
+)
+
+
+def test_window_split_keeps_h4_sections_with_their_parent():
+    chunks = window_split(DEEP_HEADINGS, BASE_METADATA)
+
+    assert len(chunks) == 1
+    text = chunks[0].page_content
+    for fragment in ("## History", "Short intro line.", "#### Early work", "First prototypes appeared."):
+        assert fragment in text
+    assert chunks[0].metadata["H2"] == "History"
+
+
+def test_window_split_ignores_hashtag_lines():
+    chunks = window_split("# Title\nIntro paragraph.\n#hashtag\nMore text.", BASE_METADATA)
+
+    assert len(chunks) == 1
+    assert "#hashtag\nMore text." in chunks[0].page_content
+    assert chunks[0].metadata["H1"] == "Title"
+
+
+def test_window_split_still_splits_on_h1_to_h3():
+    chunks = window_split("# A\nalpha\n## B\nbeta\n### C\ngamma", BASE_METADATA)
+
+    assert [chunk.page_content for chunk in chunks] == ["# A\nalpha", "## B\nbeta", "### C\ngamma"]
+    assert chunks[-1].metadata == {"H1": "A", "H2": "B", "H3": "C", **BASE_METADATA}